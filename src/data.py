@@ -1,6 +1,33 @@
 import yfinance as yf
-import pandas as pd
 import numpy as np
+import streamlit as st
+
+# Cache lifetimes in seconds: daily bars barely move intraday, intraday bars go stale quickly
+DAILY_TTL = 3600
+INTRADAY_TTL = 120
+
+
+@st.cache_data(ttl=DAILY_TTL, show_spinner=False)
+def _load_daily(ticker, start_date, period, interval):
+    return fetch_gold_data(ticker, start_date=start_date, period=period, interval=interval)
+
+
+@st.cache_data(ttl=INTRADAY_TTL, show_spinner=False)
+def _load_intraday(ticker, start_date, period, interval):
+    return fetch_gold_data(ticker, start_date=start_date, period=period, interval=interval)
+
+
+def load_gold_data(ticker="GC=F", start_date=None, period="max", interval="1d"):
+    """
+    Cached wrapper around fetch_gold_data.
+    
+    Identical (ticker, start_date, period, interval) requests are served from the
+    Streamlit cache instead of re-downloading from Yahoo Finance. Daily data is kept
+    for an hour, intraday data for two minutes.
+    """
+    loader = _load_daily if interval == "1d" else _load_intraday
+    return loader(ticker, start_date, period, interval)
+
 
 def fetch_gold_data(ticker="GC=F", start_date=None, period="max", interval="1d"):
     """
@@ -15,29 +42,22 @@ def fetch_gold_data(ticker="GC=F", start_date=None, period="max", interval="1d")
     Returns:
         pd.DataFrame: DataFrame with 'Price' and 'Returns' columns.
     """
-    print(f"Fetching data for {ticker} (Interval: {interval}, Period: {period})...")
+    # Single-ticker history returns flat columns and, with actions=False,
+    # skips fetching dividends/splits
+    tk = yf.Ticker(ticker)
+    kwargs = dict(interval=interval, auto_adjust=False, actions=False)
     
     # If Start Date is provided and interval is daily, prefer start date
     if interval == "1d" and start_date:
-        df = yf.download(ticker, start=start_date, interval=interval, progress=False)
+        df = tk.history(start=start_date, **kwargs)
     else:
         # For intraday, use period
-        df = yf.download(ticker, period=period, interval=interval, progress=False)
+        df = tk.history(period=period, **kwargs)
     
     # Check if data is empty
     if df.empty:
         raise ValueError(f"No data found for ticker {ticker}. Check your internet connection or ticker symbol.")
 
-    # Handle MultiIndex columns if present (yfinance update for multiple tickers, 
-    # but sometimes happens even with one)
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            # Try to get the ticker level if it exists
-            df = df.xs(ticker, axis=1, level=1)
-        except KeyError:
-            # Fallback if structure is different, usually 'Close' is at level 0
-            pass
-
     # Ensure we have the Close price
     if 'Close' not in df.columns:
          # Try using 'Adj Close' if 'Close' is missing
@@ -52,8 +72,15 @@ def fetch_gold_data(ticker="GC=F", start_date=None, period="max", interval="1d")
     
     # Calculate Log Returns * 100 for better numerical stability in optimization
     # r_t = 100 * (ln(P_t) - ln(P_{t-1}))
-    df['Returns'] = np.log(df['Price'] / df['Price'].shift(1)) * 100
-    df.dropna(inplace=True)
+    # Computed on the raw array to skip pandas index alignment
+    price = df['Price'].to_numpy(dtype=np.float64, copy=False)
+    r = np.empty_like(price)
+    r[:1] = np.nan
+    np.log(price[1:] / price[:-1], out=r[1:])
+    r[1:] *= 100.0
+    df['Returns'] = r
+    # Drops the first row and any non-finite return (e.g. from a zero or negative price)
+    df = df[np.isfinite(r)]
     
     # Ensure index is timezone-naive for compatibility with matplotlib/statsmodels
     if df.index.tz is not None:
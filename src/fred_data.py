@@ -1,54 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-from fredapi import Fred
 import streamlit as st
 
+
+class PartialFetchError(RuntimeError):
+    """
+    Raised when some FRED series could not be fetched.
+
+    Carries the series that did arrive (or None) and the error per failed series, so
+    the caller can still use them while the incomplete result stays out of the cache.
+    """
+    def __init__(self, partial, failures):
+        super().__init__(f"Could not fetch {', '.join(failures)}")
+        self.partial = partial
+        self.failures = failures
+
+
 def fetch_fred_data(api_key, start_date="2000-01-01"):
     """
     Fetches key macroeconomic indicators from FRED.
+
+    Complete results are cached for an hour. Failures are not cached, so a
+    transient FRED or network error is retried on the next run.
     """
     if not api_key:
         return None
-        
+
     try:
-        fred = Fred(api_key=api_key)
-        
-        # Series IDs
-        # DGS10: 10-Year Treasury Constant Maturity Rate
-        # T10YIE: 10-Year Breakeven Inflation Rate
-        # DTWEXBGS: Trade Weighted U.S. Dollar Index: Broad, Goods and Services
-        # T10Y2Y: 10-Year Treasury Constant Maturity Minus 2-Year Treasury Constant Maturity
-        
-        # Note: Some series might have different start dates or frequencies.
-        # We'll fetch them and resample/forward fill.
-        
-        series_ids = {
-            '10Y Yield': 'DGS10',
-            '10Y Breakeven Inflation': 'T10YIE', 
-            'US Dollar Index': 'DTWEXBGS',
-            'Yield Curve (10Y-2Y)': 'T10Y2Y'
-        }
-        
-        data_frames = []
-        for name, series_id in series_ids.items():
+        return _fetch_macro(api_key, start_date)
+    except PartialFetchError as e:
+        for name, error in e.failures.items():
+            st.warning(f"Could not fetch {name}: {error}")
+        return e.partial
+    except Exception as e:
+        st.error(f"Error connecting to FRED API: {e}")
+        return None
+
+
+# Only successful, complete fetches return normally; st.cache_data doesn't cache raised exceptions
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_macro(api_key, start_date):
+    from fredapi import Fred
+
+    fred = Fred(api_key=api_key)
+
+    # Series IDs
+    # DGS10: 10-Year Treasury Constant Maturity Rate
+    # T10YIE: 10-Year Breakeven Inflation Rate
+    # DTWEXBGS: Trade Weighted U.S. Dollar Index: Broad, Goods and Services
+    # T10Y2Y: 10-Year Treasury Constant Maturity Minus 2-Year Treasury Constant Maturity
+
+    # Note: Some series might have different start dates or frequencies.
+    # We'll fetch them and resample/forward fill.
+
+    series_ids = {
+        '10Y Yield': 'DGS10',
+        '10Y Breakeven Inflation': 'T10YIE',
+        'US Dollar Index': 'DTWEXBGS',
+        'Yield Curve (10Y-2Y)': 'T10Y2Y'
+    }
+
+    # Common business-day grid every series is aligned to
+    target_idx = pd.bdate_range(start_date, pd.Timestamp.today().normalize())
+
+    def fetch_one(series_id):
+        series = fred.get_series(series_id, observation_start=start_date)
+        # Forward fill onto the shared grid to handle weekends/holidays differences
+        return series.dropna().reindex(target_idx, method='ffill')
+
+    # The requests are pure I/O, so fetch all series concurrently
+    data_frames = []
+    failures = {}
+    with ThreadPoolExecutor(max_workers=len(series_ids)) as executor:
+        futures = {name: executor.submit(fetch_one, series_id) for name, series_id in series_ids.items()}
+        for name, future in futures.items():
             try:
-                # Fetch series
-                series = fred.get_series(series_id, observation_start=start_date)
+                series = future.result()
                 series.name = name
                 data_frames.append(series)
             except Exception as e:
-                st.warning(f"Could not fetch {name} ({series_id}): {e}")
-                
-        if not data_frames:
-            return None
-            
-        # Combine into DataFrame
-        macro_df = pd.concat(data_frames, axis=1)
-        
-        # Forward fill to handle weekends/holidays differences if any
-        macro_df = macro_df.fillna(method='ffill')
-        
-        return macro_df
-        
-    except Exception as e:
-        st.error(f"Error connecting to FRED API: {e}")
-        return None
+                failures[f"{name} ({series_ids[name]})"] = e
+
+    # Combine into DataFrame (already aligned, so no union index is built)
+    macro_df = pd.concat(data_frames, axis=1) if data_frames else None
+    if failures:
+        raise PartialFetchError(macro_df, failures)
+    return macro_df
@@ -0,0 +1,33 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+def hash_pandas(obj):
+    """
+    Returns a 16-byte Blake2b digest of a Series or DataFrame.
+    
+    Hashes the underlying value buffer, the index and the column labels, which is
+    far cheaper than Streamlit's default hasher for long series.
+    
+    Args:
+        obj (pd.Series | pd.DataFrame): Object to hash.
+    
+    Returns:
+        bytes: Digest usable as a cache key.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    values = np.ascontiguousarray(obj.to_numpy())
+    h.update(values.dtype.str.encode())
+    h.update(str(values.shape).encode())
+    # Numeric buffers are hashed in place; only object arrays need a hashable copy
+    h.update(pd.util.hash_array(values.ravel()) if values.dtype.hasobject else values)
+    index = obj.index
+    index_values = np.ascontiguousarray(index.asi8 if hasattr(index, 'asi8') else index)
+    h.update(pd.util.hash_array(index_values) if index_values.dtype.hasobject else index_values)
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(tuple(obj.columns)).encode())
+    return h.digest()
+
+# hash_funcs for st.cache_data / st.cache_resource on functions taking pandas inputs
+PANDAS_HASH_FUNCS = {pd.Series: hash_pandas, pd.DataFrame: hash_pandas}
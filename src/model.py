@@ -1,12 +1,112 @@
+import pathlib
+import time
+
+import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from statsmodels.tsa.regime_switching.markov_regression import MarkovRegression
+import streamlit as st
+
+from src.hashing import PANDAS_HASH_FUNCS, hash_pandas
+
+# Last converged parameters per (k_regimes, data length bucket), used as start_params
+_WARM_STARTS = {}
+WARM_START_BUCKET = 500
+# Series longer than this are passed to the model as float32
+FLOAT32_MIN_LENGTH = 5000
+
+# On-disk cache of fitted parameters, so worker restarts don't re-run the optimizer
+_CACHE_DIR = pathlib.Path('.model_cache')
+DISK_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds
+
+
+def _disk_key(returns, k_regimes, search_reps, em_iter):
+    """
+    Returns the on-disk cache path for a fit of returns with these model and optimizer settings.
+    """
+    return _CACHE_DIR / f"{k_regimes}_{search_reps}_{em_iter}_{hash_pandas(returns).hex()}.npy"
+
+
+def _load_params(path):
+    """
+    Loads cached parameters, or returns None if missing or unreadable.
+    
+    Files older than DISK_CACHE_MAX_AGE are deleted first. Intraday data changes
+    with every download, so without pruning each fit would leave a file behind.
+    Joblib files from older versions are never read and are always deleted.
+    """
+    now = time.time()
+    for cached in _CACHE_DIR.glob('*.*'):
+        try:
+            if cached.suffix == '.jl' or now - cached.stat().st_mtime > DISK_CACHE_MAX_AGE:
+                cached.unlink()
+        except OSError:
+            pass
+    try:
+        # Only a float array is ever stored, so nothing needs unpickling
+        return np.load(path, allow_pickle=False)
+    except Exception:
+        return None
+
+
+def _save_params(path, params):
+    """
+    Stores fitted parameters on disk. Failures only cost a refit later, so they are ignored.
+    """
+    try:
+        _CACHE_DIR.mkdir(exist_ok=True)
+        np.save(path, np.asarray(params, dtype=np.float64), allow_pickle=False)
+    except Exception as e:
+        print(f"Could not write model cache: {e}")
+
+
+@st.cache_resource(max_entries=8, show_spinner=False, hash_funcs=PANDAS_HASH_FUNCS)
+def _fit_markov(returns, k_regimes, search_reps=0, em_iter=5):
+    """
+    Fits the Markov Switching Model to the returns series.
+    
+    Cached as a resource so reruns with the same data and number of regimes
+    reuse the fitted results instead of re-running the optimizer. The series is
+    hashed with a Blake2b digest of its buffer rather than Streamlit's default
+    pandas hasher. Fits are warm-started from the last converged parameters of a
+    similarly sized series.
+    
+    Converged parameters are also kept on disk; on a hit only the filter and
+    smoother are run, skipping the optimizer.
+    """
+    # statsmodels is slow to import, so only load it once a fit is actually needed
+    from statsmodels.tsa.regime_switching.markov_regression import MarkovRegression
+    
+    # Hamilton suggestion: switching mean and switching variance
+    # "Focusing only on the most important shifting parameters, such as the intercept (mean return) and variance"
+    model = MarkovRegression(returns, k_regimes=k_regimes, trend='c', switching_variance=True)
+    
+    path = _disk_key(returns, k_regimes, search_reps, em_iter)
+    params = _load_params(path)
+    if params is not None and len(params) == len(model.param_names):
+        return model.smooth(params, cov_type='none')
+    
+    warm_key = (k_regimes, len(returns) // WARM_START_BUCKET)
+    # cov_type='none' skips the numerical Hessian for standard errors, which the
+    # app doesn't need and which costs many extra passes of the Hamilton filter
+    results = model.fit(start_params=_WARM_STARTS.get(warm_key), disp=False, maxiter=100,
+                        cov_type='none', search_reps=search_reps, em_iter=em_iter)
+    # Only converged params are worth starting the next fit from or serving from disk
+    if results.mle_retvals.get('converged') and np.all(np.isfinite(results.params)):
+        _WARM_STARTS[warm_key] = np.asarray(results.params).copy()
+        _save_params(path, results.params)
+    return results
+
 
 class GoldRegimeModel:
-    def __init__(self, k_regimes=2):
+    def __init__(self, k_regimes=2, search_reps=0, em_iter=5):
         self.k_regimes = k_regimes
+        # Optimizer settings passed through to MarkovRegression.fit
+        self.search_reps = search_reps
+        self.em_iter = em_iter
         self.model = None
         self.results = None
+        # Summary outputs, materialized once per fit
+        self._probs_df = None
+        self._stats_df = None
         
     def fit(self, returns):
         """
@@ -16,17 +116,26 @@ class GoldRegimeModel:
         Args:
             returns (pd.Series): Time series of returns.
         """
-        # Hamilton suggestion: switching mean and switching variance
-        # "Focusing only on the most important shifting parameters, such as the intercept (mean return) and variance"
-        self.model = MarkovRegression(returns, k_regimes=self.k_regimes, trend='c', switching_variance=True)
+        if len(returns) > FLOAT32_MIN_LENGTH:
+            # Halves the bytes hashed for the cache key and copied into the model.
+            # statsmodels still runs the Hamilton filter itself in float64.
+            returns = returns.astype(np.float32)
         
         try:
-            self.results = self.model.fit()
+            self.results = _fit_markov(returns, self.k_regimes, self.search_reps, self.em_iter)
         except Exception as e:
             print(f"Model fitting failed: {e}")
             raise e
             
-        return self.results.summary()
+        self.model = self.results.model
+        self._probs_df = self.results.smoothed_marginal_probabilities
+        self._stats_df = self._build_regime_stats()
+        
+        try:
+            return self.results.summary()
+        except Exception:
+            # Without a covariance matrix the summary table may not render; show params only
+            return self.results.params.to_string()
         
     def predict_probs(self):
         """
@@ -35,7 +144,7 @@ class GoldRegimeModel:
         if self.results is None:
             raise ValueError("Model not fitted yet.")
         # smoothed_marginal_probabilities gives P(S_t=j | T) (using full sample)
-        return self.results.smoothed_marginal_probabilities
+        return self._probs_df
 
     def get_regime_stats(self):
         """
@@ -43,7 +152,12 @@ class GoldRegimeModel:
         """
         if self.results is None:
             raise ValueError("Model not fitted yet.")
-            
+        return self._stats_df
+
+    def _build_regime_stats(self):
+        """
+        Builds the per-regime mean/variance table from the fitted parameters.
+        """
         params = self.results.params
         stats = {}
         
@@ -72,24 +186,11 @@ class GoldRegimeModel:
         if self.k_regimes != 3:
             return {f"Regime {i}": f"Regime {i}" for i in range(self.k_regimes)}
             
-        # Transpose to get regimes as rows for easier sorting
+        # Order regimes by Mean Return, highest first
         # stats_df has columns 'Regime 0', 'Regime 1', ...
-        df_t = stats_df.T
-        
-        # Sort by Mean Return
-        df_sorted = df_t.sort_values('Mean Return', ascending=False)
-        
-        # Highest Mean = Bullish
-        bullish_regime = df_sorted.index[0]
-        
-        # Lowest Mean = Bearish
-        bearish_regime = df_sorted.index[-1]
-        
-        # Middle = Consolidating
-        consolidating_regime = df_sorted.index[1]
+        means = np.array([stats_df.loc['Mean Return', f'Regime {i}'] for i in range(self.k_regimes)])
+        order = np.argsort(-means)
         
-        return {
-            bullish_regime: "Bullish 🐂",
-            consolidating_regime: "Consolidating 🦀",
-            bearish_regime: "Bearish 🐻"
-        }
+        # Highest Mean = Bullish, Middle = Consolidating, Lowest Mean = Bearish
+        labels = ["Bullish 🐂", "Consolidating 🦀", "Bearish 🐻"]
+        return {f"Regime {order[j]}": labels[j] for j in range(self.k_regimes)}
@@ -1,40 +1,373 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
+import functools
+import io
+import os
+import sys
+import threading
 
-def plot_price_and_regimes(data, probs):
+import numpy as np
+import streamlit as st
+
+from src.hashing import PANDAS_HASH_FUNCS
+
+FIG_SIZE = (12, 8)
+# Figures are drawn and exported at this DPI. st.pyplot always saves at 200 dpi,
+# so the app renders the PNG itself via render_png to keep it small.
+FIG_DPI = 90
+# Series are downsampled to this many points per horizontal pixel before drawing
+POINTS_PER_PIXEL = 2
+
+# Figure attribute holding its data artists (and blit backgrounds) for in-place updates.
+# Kept on the figure rather than in a module-level mapping, whose values would
+# reference the figure through its axes and keep it alive.
+_STATE_ATTR = '_regime_plot_state'
+
+# The seaborn style contexts swap the process-wide rcParams in and out. Streamlit
+# builds figures on several session threads at once, so the styled section runs
+# under this lock, or overlapping contexts would restore each other's settings.
+_STYLE_LOCK = threading.Lock()
+
+def render_price_and_regimes(data, probs):
+    """
+    Returns the price and regime chart as PNG bytes, for st.image.
+    
+    The PNG is cached on a Blake2b digest of the price and probability contents
+    (values, index and columns), so repeated calls with the same data skip
+    Matplotlib entirely. Only the bytes are shared between sessions; the figure
+    behind them is built privately and dropped after rendering.
+    
+    Args:
+        data (pd.DataFrame): Dataframe with 'Price'. Index should be datetime.
+        probs (pd.DataFrame): Smoothed probabilities from the model.
+    """
+    return _cached_png(data[['Price']], probs)
+
+def plot_price_and_regimes(data, probs, fig=None):
     """
     Plots the gold price and the smoothed probabilities of the regimes.
     
+    Returns a new pyplot figure on the active backend, so plt.show() displays it and
+    update_price_and_regimes can blit on interactive canvases. pyplot keeps it alive
+    until plt.close(fig). Use render_price_and_regimes for cached output.
+    
     Args:
         data (pd.DataFrame): Dataframe with 'Price'. Index should be datetime.
         probs (pd.DataFrame): Smoothed probabilities from the model.
+        fig (matplotlib.figure.Figure): Optional figure from an earlier call to reuse.
+            Its axes, ticks, labels and legends are kept and only the data artists
+            are updated, as long as the number of regimes matches. Any other figure
+            gets a new one instead.
+    """
+    if fig is not None and _reusable(fig, probs):
+        update_price_and_regimes(fig, data, probs)
+        return fig
+    return _build_fig(data, probs)
+
+def render_png(fig):
+    """
+    Renders fig to PNG bytes at FIG_DPI, cropped like st.pyplot, for st.image.
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=FIG_DPI, bbox_inches='tight')
+    return buf.getvalue()
+
+def update_price_and_regimes(fig, data, probs):
+    """
+    Updates a figure from plot_price_and_regimes with new data in place.
+    
+    For live monitoring loops: the existing artists get new data instead of a new
+    figure being built. While the axis limits are unchanged only the data artists
+    are redrawn and blitted over saved backgrounds; otherwise the backgrounds are
+    re-captured with one full draw. Canvases without blitting get draw_idle().
+    
+    Args:
+        fig (matplotlib.figure.Figure): Figure returned by plot_price_and_regimes.
+        data (pd.DataFrame): Dataframe with 'Price'. Index should be datetime.
+        probs (pd.DataFrame): Smoothed probabilities, with the same regimes as before.
+    """
+    state = getattr(fig, _STATE_ATTR, None)
+    if state is None:
+        raise ValueError("Figure was not created by plot_price_and_regimes.")
+    if not _reusable(fig, probs):
+        raise ValueError("Number of regimes changed; build a new figure instead.")
+        
+    n_out = _target_points(fig.get_size_inches()[0])
+    x_price, price_arr, x, probs_arr = _plot_arrays(data, probs, n_out)
+    segments, verts = _regime_geometry(x, probs_arr)
+    
+    ax_price, ax_probs = state['axes']
+    limits = (ax_price.get_xlim(), ax_price.get_ylim())
+    state['price'].set_data(x_price, price_arr)
+    _update_lines(state['lines'], segments)
+    _update_fills(state['fills'], verts)
+    # relim() skips collections, so the probability panel's data limits are set by hand;
+    # with sharex both panels feed the shared x autoscale
+    ax_probs.relim()
+    ax_probs.update_datalim([(x[0], 0.0), (x[-1], 1.0)])
+    ax_price.relim()
+    ax_price.autoscale_view()
+    
+    canvas = fig.canvas
+    if not canvas.supports_blit:
+        canvas.draw_idle()
+        return
+    
+    if state['backgrounds'] is None or limits != (ax_price.get_xlim(), ax_price.get_ylim()):
+        _capture_backgrounds(fig, state)
+    for ax, background, artists in zip(state['axes'], state['backgrounds'],
+                                       ([state['price']], [state['fills'], state['lines']])):
+        canvas.restore_region(background)
+        for artist in artists:
+            ax.draw_artist(artist)
+        # Redraw the legend so it stays on top of the blitted data
+        if ax.get_legend() is not None:
+            ax.draw_artist(ax.get_legend())
+        canvas.blit(ax.bbox)
+
+def _update_lines(lines, segments):
+    """
+    Writes new segments into the regime LineCollection, in place when the point count is unchanged.
+    """
+    paths = lines.get_paths()
+    if len(paths) != len(segments) or any(len(path.vertices) != segments.shape[1] for path in paths):
+        lines.set_segments(segments)
+        return
+    for path, segment in zip(paths, segments):
+        path.vertices[:] = segment
+    lines.stale = True
+
+def _update_fills(fills, verts):
+    """
+    Writes new polygons into the fill PolyCollection, in place when the vertex count is unchanged.
+    """
+    paths = fills.get_paths()
+    # Closed paths carry one extra vertex that repeats the first
+    if len(paths) != len(verts) or any(len(path.vertices) != verts.shape[1] + 1 for path in paths):
+        fills.set_verts(verts)
+        return
+    for path, poly in zip(paths, verts):
+        path.vertices[:-1] = poly
+        path.vertices[-1] = poly[0]
+    fills.stale = True
+
+def _reusable(fig, probs):
+    """
+    Whether fig is a figure built here that draws the same number of regimes as probs.
+    """
+    state = getattr(fig, _STATE_ATTR, None)
+    return state is not None and len(state['lines'].get_segments()) == probs.shape[1]
+
+def _capture_backgrounds(fig, state):
     """
-    # Use a style for better aesthetics
-    sns.set_theme(style="whitegrid")
+    Draws the figure without its data artists and saves both axes as blit backgrounds.
+    """
+    artists = (state['price'], state['lines'], state['fills'])
+    for artist in artists:
+        artist.set_visible(False)
+    fig.canvas.draw()
+    state['backgrounds'] = [fig.canvas.copy_from_bbox(ax.bbox) for ax in state['axes']]
+    for artist in artists:
+        artist.set_visible(True)
+
+def _target_points(width_inches):
+    """
+    Returns how many points a series is downsampled to for a figure this wide,
+    based on the DPI the PNG is exported at.
+    """
+    return int(width_inches * FIG_DPI * POINTS_PER_PIXEL)
+
+def _lttb_indices(x, y, n_out):
+    """
+    Picks n_out indices of (x, y) that preserve its visual shape (Largest-Triangle-Three-Buckets).
+    
+    Vectorized variant: the interior is split into n_out - 2 buckets and each keeps the
+    point forming the largest triangle with the neighbouring bucket averages (classic
+    LTTB uses the previously selected point, which forces a Python loop). The first
+    and last points are always kept. Non-finite points are skipped, since one NaN
+    would carry through the cumulative sums and break every later bucket.
+    """
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        good = np.flatnonzero(finite)
+        return good[_lttb_indices(x[good], y[good], n_out)]
+    
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+        
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, counts = edges[:-1], np.diff(edges)
+    bucket = np.repeat(np.arange(len(starts)), counts)
+    
+    # Bucket averages via cumulative sums
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    avg_x = (cum_x[edges[1:]] - cum_x[starts]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[starts]) / counts
+    
+    # Triangle corners: previous bucket average (first point for bucket 0) and
+    # next bucket average (last point for the final bucket)
+    ax, ay = np.r_[x[0], avg_x[:-1]][bucket], np.r_[y[0], avg_y[:-1]][bucket]
+    cx, cy = np.r_[avg_x[1:], x[-1]][bucket], np.r_[avg_y[1:], y[-1]][bucket]
+    px, py = x[1:n - 1], y[1:n - 1]
+    area = np.abs((ax - cx) * (py - ay) - (ax - px) * (cy - ay))
+    
+    # First index of the per-bucket maximum
+    best = np.flatnonzero(area == np.maximum.reduceat(area, starts - 1)[bucket])
+    best = best[np.r_[True, np.diff(bucket[best]) != 0]]
+    return np.r_[0, best + 1, n - 1]
+
+def _plot_arrays(data, probs, n_out):
+    """
+    Returns (price x values, prices, probability x values, probabilities) as plain
+    arrays, downsampled to about n_out points when longer. x values are Matplotlib
+    date numbers, so the axes never run their own unit conversion.
+    """
+    import matplotlib.dates as mdates
+    
+    # Pull plain arrays out once so drawing never goes through pandas indexing
+    price_arr = data['Price'].to_numpy(copy=False)
+    probs_arr = probs.to_numpy(copy=False)
+    
+    # Convert dates once; the probabilities normally share the price index
+    x_price = mdates.date2num(data.index.to_numpy())
+    x = x_price if probs.index.equals(data.index) else mdates.date2num(probs.index.to_numpy())
+    
+    # Visual level of detail: more vertices than pixels only costs Agg draw time
+    if len(price_arr) > n_out:
+        keep = _lttb_indices(x_price, price_arr, n_out)
+        price_arr, x_price = price_arr[keep], x_price[keep]
+    
+    if len(probs_arr) > n_out:
+        # Union of each regime's picks so all regimes share one x grid; each regime
+        # gets an equal share of the budget so the union stays within n_out points
+        k = probs_arr.shape[1]
+        keep = np.unique(np.concatenate([_lttb_indices(x, probs_arr[:, i], n_out // k)
+                                         for i in range(k)]))
+        probs_arr, x = probs_arr[keep], x[keep]
     
-    fig, axes = plt.subplots(2, 1, figsize=(12, 8), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+    return x_price, price_arr, x, probs_arr
+
+def _regime_geometry(x, probs_arr):
+    """
+    Returns the regime line segments and the fill polygons under them.
+    """
+    # One (k, N, 2) array for all regime lines, filled by broadcasting
+    segments = np.empty((probs_arr.shape[1], len(x), 2))
+    segments[:, :, 0] = x
+    segments[:, :, 1] = probs_arr.T
+    
+    # Each fill polygon runs along the probability curve and back along zero. A single
+    # (k, 2N, 2) array lets PolyCollection take its fast path for equal-length polygons.
+    n = len(x)
+    verts = np.empty((probs_arr.shape[1], 2 * n, 2))
+    verts[:, :n, 0] = x
+    verts[:, :n, 1] = probs_arr.T
+    verts[:, n:, 0] = x[::-1]
+    verts[:, n:, 1] = 0.0
+    return segments, verts
+
+# Only the rendered bytes are cached: they are immutable, safe to hand to several
+# sessions' threads at once, and evicting them frees the render buffer too
+# Sized for every interval x regime-count combination the sidebar allows
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs=PANDAS_HASH_FUNCS)
+def _cached_png(data, probs):
+    return render_png(_build_fig(data, probs, offscreen=True))
+
+def _pyplot():
+    """
+    Imports pyplot, pinning the Agg backend on headless Linux workers (no display, no
+    explicit MPLBACKEND) so no GUI toolkit is probed or loaded. Interactive sessions
+    keep their backend.
+    """
+    if 'matplotlib.pyplot' not in sys.modules and sys.platform.startswith('linux') \
+            and not any(os.environ.get(var) for var in ('DISPLAY', 'WAYLAND_DISPLAY', 'MPLBACKEND')):
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+@functools.lru_cache(maxsize=8)
+def _legend_entries(colors, cols):
+    """
+    Returns the proxy handles and labels for the regime legend.
     
-    # Plot Gold Price
-    axes[0].plot(data.index, data['Price'], color='#D4AF37', label='Gold Price (USD)', linewidth=1.5)
+    The collections carry no per-regime legend entries, so one Line2D proxy per regime
+    stands in. Built once per (colors, regimes) combination; the legend copies their
+    properties, so sharing them between figures is safe.
+    """
+    from matplotlib.lines import Line2D
+    
+    handles = tuple(Line2D([0], [0], color=color, linewidth=1) for color in colors)
+    labels = tuple(f'Regime {col}' for col in cols)
+    return handles, labels
+
+def _setup_static(axes, cols, colors):
+    """
+    Installs the titles, labels, limits and legends, which never change when a figure is reused.
+    """
     axes[0].set_title('Gold Price and Regime Probabilities', fontsize=16)
     axes[0].set_ylabel('Price (USD)', fontsize=12)
     axes[0].legend(loc='upper left')
     
-    # Plot Regime Probabilities
-    cols = probs.columns
-    # Define a color palette (up to 5 regimes)
-    colors = ['blue', 'red', 'green', 'orange', 'purple']
-    
-    for i, col in enumerate(cols):
-        color = colors[i % len(colors)]
-        axes[1].plot(probs.index, probs[col], label=f'Regime {col}', color=color, alpha=0.6, linewidth=1)
-        axes[1].fill_between(probs.index, 0, probs[col], color=color, alpha=0.1)
-    
     axes[1].set_ylabel('Probability', fontsize=12)
     axes[1].set_xlabel('Date', fontsize=12)
     axes[1].set_ylim(0, 1.05)
-    axes[1].legend(loc='upper left')
+    handles, labels = _legend_entries(tuple(colors), tuple(cols))
+    axes[1].legend(handles, labels, loc='upper left')
+
+def _build_fig(data, probs, offscreen=False):
+    # Matplotlib and seaborn are slow to import, so only load them when drawing.
+    # seaborn imports pyplot itself, so the backend is pinned first.
+    plt = _pyplot()
+    import seaborn as sns
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection, PolyCollection
+    from matplotlib.figure import Figure
+    
+    x_price, price_arr, x, probs_arr = _plot_arrays(data, probs, _target_points(FIG_SIZE[0]))
     
-    plt.tight_layout()
+    # Use a style for better aesthetics, scoped to this figure so the global
+    # rcParams (and other callers' plots) are left alone once it is built
+    with _STYLE_LOCK, sns.axes_style("whitegrid"), sns.plotting_context("notebook"):
+        # Data artists are individually rasterized: PNG output is unchanged, while PDF/SVG
+        # exports keep axes, ticks and text as vectors but draw the long series in one
+        # raster pass at the savefig DPI. (An axes rasterization zorder would also catch
+        # the axis artists, which seaborn's whitegrid puts below the data.)
+        # Offscreen figures are only rendered to PNG: they get a bare Agg canvas outside
+        # pyplot's figure registry, so nothing keeps them (and their render buffer) alive
+        # once dropped. Others use the active backend's canvas and can be shown and blitted.
+        if offscreen:
+            fig = Figure(figsize=FIG_SIZE, dpi=FIG_DPI)
+            FigureCanvasAgg(fig)
+        else:
+            fig = plt.figure(figsize=FIG_SIZE, dpi=FIG_DPI)
+        axes = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+        
+        # Plot Gold Price
+        price_line, = axes[0].plot(x_price, price_arr, color='#D4AF37', label='Gold Price (USD)', linewidth=1.2,
+                                   rasterized=True)
+        # x values are pre-converted date numbers; with sharex this formats both panels as dates
+        axes[0].xaxis_date()
+        
+        # Plot Regime Probabilities
+        # All regimes go into one LineCollection and one PolyCollection, so the
+        # panel is two artists regardless of the number of regimes
+        cols = probs.columns
+        # Define a color palette (up to 5 regimes)
+        colors = ['#4C72B0', '#DD8452', '#55A467', '#C44E52', '#8172B3']
+        colors = [colors[i % len(colors)] for i in range(len(cols))]
+        
+        segments, verts = _regime_geometry(x, probs_arr)
+        fills = axes[1].add_collection(PolyCollection(verts, facecolors=colors, edgecolors='none', alpha=0.1,
+                                                      rasterized=True))
+        lines = axes[1].add_collection(LineCollection(segments, colors=colors, linewidths=1, alpha=0.6,
+                                                      rasterized=True))
+        axes[1].autoscale_view(scaley=False)
+        
+        _setup_static(axes, cols, colors)
+        fig.tight_layout()
+    # axes is stored as a tuple: the garbage collector can't see into NumPy object
+    # arrays, so a figure -> state -> array -> axes -> figure cycle would never be freed
+    setattr(fig, _STATE_ATTR, {'axes': tuple(axes), 'price': price_line, 'lines': lines, 'fills': fills,
+                               'backgrounds': None})
     return fig